@@ -1,95 +1,327 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import os
 import glob
+import json
+import argparse
 
-MAP_SIZE = 65536
+import bitmap
 
-def generate_multi_target_report():
-    out_dir = "./out"
+# --- 增量分析配置 ---
+# 缓存目录：记录每个 CSV / plot_data 已读取的字节偏移和降采样后的曲线
+CACHE_DIR_NAME = ".analyze_cache"
+CACHE_VERSION = 1
+# 每条曲线最多保留的桶数，超过后桶宽翻倍并两两合并 (min/max 降采样)
+MAX_BUCKETS = 2000
+# 文件头指纹长度：Fuzzer 重启时会用 "w" 重写文件，靠它判断缓存是否失效
+HEAD_FINGERPRINT_LEN = 256
+
+PLOT_DATA_FIELDS = ["unix_time", "cycles_done", "cur_path", "paths_total", "pending_total", "pending_favs",
+                    "map_size", "unique_crashes", "unique_hangs", "max_depth", "execs_per_sec"]
+
+# 来自 stats_targetX.csv 的曲线 / 来自 plot_data 的曲线
+STATS_SERIES = ["cov", "total_execs"]
+PLOT_SERIES = ["paths_total", "map_size", "unique_crashes", "unique_hangs", "execs_per_sec"]
+
+
+# === 降采样曲线 (min/max per bucket) ===
+def new_series():
+    # 每个桶: [key, t_first, t_last, y_min, y_max]
+    return {"width": 1.0, "buckets": []}
+
+
+def series_append(series, t, y):
+    """追加一个点。时间单调递增，因此只需检查最后一个桶。"""
+    buckets = series["buckets"]
+    key = int(t // series["width"])
+    if buckets and buckets[-1][0] == key:
+        b = buckets[-1]
+        b[2] = t
+        b[3] = min(b[3], y)
+        b[4] = max(b[4], y)
+    else:
+        buckets.append([key, t, t, y, y])
+
+    if len(buckets) > MAX_BUCKETS:
+        # 桶宽翻倍：旧桶 k 落入新桶 k // 2
+        series["width"] *= 2
+        merged = []
+        for b in buckets:
+            k = b[0] // 2
+            if merged and merged[-1][0] == k:
+                m = merged[-1]
+                m[2] = b[2]
+                m[3] = min(m[3], b[3])
+                m[4] = max(m[4], b[4])
+            else:
+                merged.append([k, b[1], b[2], b[3], b[4]])
+        series["buckets"] = merged
+
+
+def series_points(series):
+    """展开为绘图用的 (xs, ys)。单调曲线 (cov/paths) 形状不失真，其余曲线呈现包络。"""
+    xs, ys = [], []
+    for _, t_first, t_last, y_min, y_max in series["buckets"]:
+        xs.append(t_first)
+        ys.append(y_min)
+        if t_last != t_first or y_max != y_min:
+            xs.append(t_last)
+            ys.append(y_max)
+    return xs, ys
+
+
+def series_max(series):
+    return max((b[4] for b in series["buckets"]), default=0)
+
+
+# === 缓存读写 ===
+def new_target_state():
+    return {
+        "version": CACHE_VERSION,
+        "stats": {"offset": 0, "head": "", "columns": None},
+        "plot": {"offset": 0, "head": "", "base_time": None},
+        "series": {name: new_series() for name in STATS_SERIES + PLOT_SERIES},
+        "total_time": 0.0,
+    }
+
+
+def load_target_state(cache_dir, target_name):
+    path = os.path.join(cache_dir, f"{target_name}.json")
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+            if state.get("version") == CACHE_VERSION:
+                return state
+        except Exception as e:
+            print(f"[!] Cache for {target_name} is corrupted, rebuilding: {e}")
+    return new_target_state()
+
+
+def save_target_state(cache_dir, target_name, state):
+    path = os.path.join(cache_dir, f"{target_name}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)  # 原子替换，避免中途被打断留下半个缓存
+
+
+# === 增量读取 ===
+def file_was_rewritten(path, file_state):
+    """文件变短或开头内容变了，说明被新一轮 Fuzzing 重写，需要从头读"""
+    with open(path, "rb") as f:
+        head = f.read(HEAD_FINGERPRINT_LEN)
+    old_head = file_state["head"].encode("latin1")
+    rewritten = os.path.getsize(path) < file_state["offset"] or not head.startswith(old_head)
+    file_state["head"] = head.decode("latin1")
+    return rewritten
+
+
+def iter_new_lines(path, file_state):
+    """从上次的字节偏移开始逐行读取，只消费完整的行 (Fuzzer 可能正在写入最后一行)"""
+    with open(path, "rb") as f:
+        f.seek(file_state["offset"])
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            file_state["offset"] += len(raw)
+            line = raw.decode("utf-8", errors="ignore").strip()
+            if line:
+                yield line
+
+
+def update_from_stats_csv(csv_file, state):
+    file_state = state["stats"]
+    if file_was_rewritten(csv_file, file_state):
+        file_state.update({"offset": 0, "columns": None})
+        for name in STATS_SERIES:
+            state["series"][name] = new_series()
+        state["total_time"] = 0.0
+
+    for line in iter_new_lines(csv_file, file_state):
+        fields = line.split(",")
+        if file_state["columns"] is None:
+            file_state["columns"] = fields  # 表头: time,cov,total_execs
+            continue
+        row = dict(zip(file_state["columns"], fields))
+        try:
+            t = float(row["time"])
+            for name in STATS_SERIES:
+                if name in row:
+                    series_append(state["series"][name], t, int(row[name]))
+            state["total_time"] = max(state["total_time"], t)
+        except (KeyError, ValueError):
+            continue
+
+
+def update_from_plot_data(plot_file, state):
+    file_state = state["plot"]
+    if file_was_rewritten(plot_file, file_state):
+        file_state.update({"offset": 0, "base_time": None})
+        for name in PLOT_SERIES:
+            state["series"][name] = new_series()
+
+    for line in iter_new_lines(plot_file, file_state):
+        if line.startswith("#"):
+            continue
+        row = dict(zip(PLOT_DATA_FIELDS, (v.strip() for v in line.split(","))))
+        try:
+            unix_time = float(row["unix_time"])
+            if file_state["base_time"] is None:
+                file_state["base_time"] = unix_time
+            t = unix_time - file_state["base_time"]
+            for name in PLOT_SERIES:
+                series_append(state["series"][name], t, float(row[name]))
+        except (KeyError, ValueError):
+            continue
+
+
+def read_fuzzer_stats(stats_path):
+    """fuzzer_stats 每次被整体覆盖且很小，直接全量读取"""
+    stats = {}
+    if not os.path.exists(stats_path):
+        return stats
+    with open(stats_path, "r", errors="ignore") as f:
+        for line in f:
+            if ":" not in line:
+                continue
+            key, value = line.split(":", 1)
+            stats[key.strip()] = value.strip()
+    return stats
+
+
+def valid_ratio(value):
+    """把 fuzzer_stats 中的 "valid/execs" 转成百分比文本"""
+    try:
+        valid, execs = (int(v) for v in value.split("/"))
+        return f"{valid / execs * 100:.1f}%" if execs else "-"
+    except (AttributeError, ValueError):
+        return "-"
+
+
+# === 绘图 ===
+def plot_series(all_states, series_name, out_path, title, ylabel, as_map_pct=False):
+    plt.figure(figsize=(12, 7))
+    for target_name, state in all_states.items():
+        xs, ys = series_points(state["series"][series_name])
+        scale = 100.0 / state["map_size"] if as_map_pct else 1.0
+        if xs:
+            plt.plot(xs, [y * scale for y in ys], label=target_name, linewidth=1.5)
+
+    plt.title(title, fontsize=16)
+    plt.xlabel('Time (seconds)', fontsize=12)
+    plt.ylabel(ylabel, fontsize=12)
+    plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    plt.grid(True, linestyle='--', alpha=0.6)
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close() # 关闭画布，防止重叠
+
+
+def generate_multi_target_report(out_dir="./out", rebuild=False):
     csv_files = glob.glob(os.path.join(out_dir, "stats_target*.csv"))
 
     if not csv_files:
         print(f"错误：在 {out_dir} 中找不到任何 stats_target*.csv 文件！")
         return
 
-    # 1. 收集数据
-    all_data = {}
+    cache_dir = os.path.join(out_dir, CACHE_DIR_NAME)
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    # 1. 增量收集数据：只读取上次之后新增的部分，结果落盘缓存
+    all_states = {}
     summary_data = []
-    
+
     for csv_file in sorted(csv_files):
         target_name = os.path.basename(csv_file).replace("stats_", "").replace(".csv", "")
+        target_out_dir = os.path.join(out_dir, target_name)
         try:
-            df = pd.read_csv(csv_file)
-            if not df.empty:
-                all_data[target_name] = df
-                summary_data.append({
-                    "Target": target_name,
-                    "Max Coverage": df['cov'].max(),
-                    "Total Time": df['time'].max()
-                })
+            state = new_target_state() if rebuild else load_target_state(cache_dir, target_name)
+            update_from_stats_csv(csv_file, state)
+
+            plot_file = os.path.join(target_out_dir, "plot_data")
+            if os.path.exists(plot_file):
+                update_from_plot_data(plot_file, state)
+
+            save_target_state(cache_dir, target_name, state)
         except Exception as e:
             print(f"[-] Error reading {csv_file}: {e}")
+            continue
+
+        if not state["series"]["cov"]["buckets"]:
+            continue
 
-    if not all_data:
+        all_states[target_name] = state
+        fuzzer_stats = read_fuzzer_stats(os.path.join(target_out_dir, "fuzzer_stats"))
+        # 每个目标的位图大小由 Fuzzer 协商后写入 fuzzer_stats，旧数据按 64KB 计算
+        state["map_size"] = int(fuzzer_stats.get("bitmap_size", bitmap.DEFAULT_MAP_SIZE))
+        summary_data.append({
+            "Target": target_name,
+            "Max Coverage": int(series_max(state["series"]["cov"])),
+            "Map Size": state["map_size"],
+            "Total Time": state["total_time"],
+            "Execs": fuzzer_stats.get("execs_done", int(series_max(state["series"]["total_execs"]))),
+            "Execs/s": fuzzer_stats.get("execs_per_sec", "-"),
+            "Paths": fuzzer_stats.get("paths_total", int(series_max(state["series"]["paths_total"]))),
+            "Crashes": fuzzer_stats.get("unique_crashes", int(series_max(state["series"]["unique_crashes"]))),
+            "Struct Valid": valid_ratio(fuzzer_stats.get("struct_valid")),
+            "Generic Valid": valid_ratio(fuzzer_stats.get("generic_valid")),
+            "Avg CPU": fuzzer_stats.get("avg_cpu_us", "-"),
+            "Peak Mem": fuzzer_stats.get("target_mem_peak_mb", "-"),
+        })
+
+    if not all_states:
         print("[-] No valid data found to plot.")
         return
 
     # 2. 绘制图表 1: 绝对覆盖率 (Edges)
-    plt.figure(figsize=(12, 7))
-    for target_name, df in all_data.items():
-        plt.plot(df['time'], df['cov'], label=target_name, linewidth=1.5)
-
-    plt.title('Multi-Target Fuzzing Coverage Comparison (Edges)', fontsize=16)
-    plt.xlabel('Time (seconds)', fontsize=12)
-    plt.ylabel('Edges Discovered', fontsize=12)
-    plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.tight_layout()
-    
     plot_path_edges = os.path.join(out_dir, "multi_target_comparison.png")
-    plt.savefig(plot_path_edges)
-    plt.close() # 关闭画布，防止重叠
+    plot_series(all_states, "cov", plot_path_edges,
+                'Multi-Target Fuzzing Coverage Comparison (Edges)', 'Edges Discovered')
     print(f"[+] 绝对覆盖率图已生成: {plot_path_edges}")
 
     # 3. 绘制图表 2: 覆盖率百分比 (%)
-    plt.figure(figsize=(12, 7))
-    for target_name, df in all_data.items():
-        # 计算百分比
-        cov_pct = (df['cov'] / MAP_SIZE) * 100
-        plt.plot(df['time'], cov_pct, label=target_name, linewidth=1.5)
-
-    plt.title('Multi-Target Fuzzing Coverage Percentage (%)', fontsize=16)
-    plt.xlabel('Time (seconds)', fontsize=12)
-    plt.ylabel('Map Coverage (%)', fontsize=12)
-    plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.tight_layout()
-
     plot_path_pct = os.path.join(out_dir, "multi_target_comparison_pct.png")
-    plt.savefig(plot_path_pct)
-    plt.close()
+    plot_series(all_states, "cov", plot_path_pct,
+                'Multi-Target Fuzzing Coverage Percentage (%)', 'Map Coverage (%)', as_map_pct=True)
     print(f"[+] 覆盖率百分比图已生成: {plot_path_pct}")
 
-    # 4. 生成 Markdown 报告
+    # 4. 绘制图表 3: 执行速度 (来自 plot_data)
+    plot_path_speed = os.path.join(out_dir, "multi_target_speed.png")
+    plot_series(all_states, "execs_per_sec", plot_path_speed,
+                'Multi-Target Fuzzing Execution Speed', 'Execs per Second')
+    print(f"[+] 执行速度图已生成: {plot_path_speed}")
+
+    # 5. 生成 Markdown 报告
     report_path = os.path.join(out_dir, "experiment_report.md")
     with open(report_path, "w") as f:
         f.write("# Fuzzing 实验多目标测试报告\n\n")
         f.write("## 1. 测试汇总表格\n\n")
-        f.write("| 目标名称 | 最终覆盖边数 | 覆盖率 (%) | 测试耗时 (s) |\n")
-        f.write("| :--- | :--- | :--- | :--- |\n")
+        f.write("| 目标名称 | 最终覆盖边数 | 覆盖率 (%) | 测试耗时 (s) | 总执行次数 | 执行速度 (execs/s) | 路径数 | 唯一崩溃 "
+                "| 有效解析率 (结构化/普通) | 平均 CPU (us) | 目标内存峰值 (MB, cgroup) |\n")
+        f.write("| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |\n")
         for item in summary_data:
-            cov_pct = (item['Max Coverage'] / MAP_SIZE) * 100
-            f.write(f"| {item['Target']} | {item['Max Coverage']} | {cov_pct:.4f}% | {item['Total Time']:.2f} |\n")
+            cov_pct = (item['Max Coverage'] / item['Map Size']) * 100
+            f.write(f"| {item['Target']} | {item['Max Coverage']} | {cov_pct:.4f}% | {item['Total Time']:.2f} "
+                    f"| {item['Execs']} | {item['Execs/s']} | {item['Paths']} | {item['Crashes']} "
+                    f"| {item['Struct Valid']} / {item['Generic Valid']} | {item['Avg CPU']} | {item['Peak Mem']} |\n")
 
         f.write("\n\n## 2. 覆盖率增长趋势 (绝对值)\n\n")
         f.write("![Coverage Edges](multi_target_comparison.png)\n")
-        
+
         f.write("\n\n## 3. 覆盖率增长趋势 (百分比)\n\n")
         f.write("![Coverage Percentage](multi_target_comparison_pct.png)\n")
 
+        f.write("\n\n## 4. 执行速度趋势\n\n")
+        f.write("![Execution Speed](multi_target_speed.png)\n")
+
     print(f"[+] 实验汇总报告已生成: {report_path}")
 
 
 if __name__ == "__main__":
-    generate_multi_target_report()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Multi-target fuzzing report generator")
+    parser.add_argument("-o", "--out-dir", default="./out", help="Fuzzer output directory")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the incremental cache and re-read all files")
+    args = parser.parse_args()
+
+    generate_multi_target_report(out_dir=args.out_dir, rebuild=args.rebuild)
\ No newline at end of file
@@ -0,0 +1,134 @@
+import re
+import struct
+from collections import Counter
+
+import mutators
+
+# --- 自动字典配置 ---
+MIN_TOKEN_LEN = 3
+MAX_TOKEN_LEN = 32          # 与 AFL 的 MAX_AUTO_EXTRA 一致
+MAX_STRING_TOKENS = 192     # 从 .rodata 提取的字符串上限
+MAX_IMMEDIATE_TOKENS = 64   # 从 .text 提取的立即数上限
+
+# --- AFL++ CmpLog 共享内存布局 (include/cmplog.h, AFL++ 4.x) ---
+CMP_MAP_W = 65536
+CMP_MAP_H = 32
+CMP_MAP_RTN_H = CMP_MAP_H // 2
+CMP_HEADER_SIZE = 2         # hits:6, shape:5, type:1, attribute:4
+CMP_OPERANDS_SIZE = 72      # struct cmp_operands / struct cmpfn_operands
+CMP_TYPE_INS = 0
+CMP_TYPE_RTN = 1
+CMPLOG_MAP_SIZE = CMP_MAP_W * CMP_HEADER_SIZE + CMP_MAP_W * CMP_MAP_H * CMP_OPERANDS_SIZE
+
+# 只匹配以 NUL 结尾的 C 字符串，过滤掉 .rodata 中查找表里碰巧可打印的字节
+STRING_RE = re.compile(rb"(?<![\x20-\x7e])[\x20-\x7e]{%d,}(?=\x00)" % MIN_TOKEN_LEN)
+
+
+def read_elf_sections(data):
+    """返回 {节名: (offset, size)}；不是 ELF 或解析失败时返回 {}"""
+    elf = mutators.parse_elf(data)
+    if elf is None:
+        return {}
+    return {s.get("name", ""): (s["offset"], s["size"]) for s in elf["sections"]}
+
+
+def extract_strings(data):
+    """提取可打印字符串，跳过 printf 格式串 (多为报错信息)，短串优先"""
+    tokens = set()
+    for m in STRING_RE.finditer(data):
+        s = m.group().strip()
+        if MIN_TOKEN_LEN <= len(s) <= MAX_TOKEN_LEN and b"%" not in s:
+            tokens.add(s)
+    return sorted(tokens, key=lambda t: (len(t), t))[:MAX_STRING_TOKENS]
+
+
+def extract_immediates(code):
+    """
+    粗略扫描 x86 机器码中的比较立即数 (cmp eax/r32, imm32 与 cmp ax/r16, imm16)。
+    字节级匹配会有误报，所以按出现次数排序只保留前若干个。
+    """
+    counter = Counter()
+    n = len(code)
+    for i in range(n - 5):
+        op = code[i]
+        if op == 0x66 and i + 4 < n:
+            # 66 3D imm16 / 66 81 F8+r imm16
+            if code[i + 1] == 0x3D:
+                value, = struct.unpack_from("<H", code, i + 2)
+            elif code[i + 1] == 0x81 and code[i + 2] & 0xF8 == 0xF8:
+                value, = struct.unpack_from("<H", code, i + 3)
+            else:
+                continue
+            if value > 0xFF and value != 0xFFFF:
+                counter[struct.pack("<H", value)] += 1
+                counter[struct.pack(">H", value)] += 1
+        elif op == 0x3D or (op == 0x81 and code[i + 1] & 0xF8 == 0xF8):
+            # 3D imm32 / 81 F8+r imm32
+            start = i + 1 if op == 0x3D else i + 2
+            if start + 4 > n:
+                continue
+            value, = struct.unpack_from("<I", code, start)
+            if 0xFF < value <= 0xFFFF:
+                counter[struct.pack("<H", value)] += 1
+                counter[struct.pack(">H", value)] += 1
+            elif 0xFFFF < value < 0xFFFF0000:
+                counter[struct.pack("<I", value)] += 1
+                counter[struct.pack(">I", value)] += 1
+    return [token for token, _ in counter.most_common(MAX_IMMEDIATE_TOKENS)]
+
+
+def extract_binary_tokens(binary_path):
+    """从目标二进制提取字典 token：.rodata 中的字符串 + .text 中的比较立即数"""
+    with open(binary_path, "rb") as f:
+        data = f.read()
+
+    sections = read_elf_sections(data)
+    if ".rodata" in sections:
+        off, size = sections[".rodata"]
+        tokens = extract_strings(data[off:off + size])
+    else:
+        tokens = extract_strings(data)
+
+    if ".text" in sections:
+        off, size = sections[".text"]
+        tokens.extend(extract_immediates(data[off:off + size]))
+    return tokens
+
+
+def parse_cmplog_map(shm):
+    """
+    读取 AFL++ CmpLog 共享内存，返回本次执行记录的比较操作数对 [(v0, v1), ...]。
+    只读取 hits > 0 的表项，避免每次拷贝整个 (约 150MB 的) 映射。
+    """
+    pairs = []
+    headers = shm.read(CMP_MAP_W * CMP_HEADER_SIZE, 0)
+    log_base = CMP_MAP_W * CMP_HEADER_SIZE
+    for k in range(CMP_MAP_W):
+        header, = struct.unpack_from("<H", headers, k * CMP_HEADER_SIZE)
+        hits = header & 0x3F
+        if not hits:
+            continue
+        shape = (header >> 6) & 0x1F
+        cmp_type = (header >> 11) & 0x1
+        rows = min(hits, CMP_MAP_RTN_H if cmp_type == CMP_TYPE_RTN else CMP_MAP_H)
+        log = shm.read(rows * CMP_OPERANDS_SIZE, log_base + k * CMP_MAP_H * CMP_OPERANDS_SIZE)
+
+        for r in range(rows):
+            entry = log[r * CMP_OPERANDS_SIZE:(r + 1) * CMP_OPERANDS_SIZE]
+            if cmp_type == CMP_TYPE_INS:
+                size = shape + 1
+                if size not in (2, 4, 8):
+                    continue
+                # struct cmp_operands: v0 位于偏移 0，v1 位于偏移 32
+                v0, v1 = entry[0:size], entry[32:32 + size]
+            else:
+                # struct cmpfn_operands: v0[32], v1[32], v0_len, v1_len
+                v0, v1 = entry[0:min(entry[64], 32)], entry[32:32 + min(entry[65], 32)]
+            if v0 != v1 and v0 and v1:
+                pairs.append((bytes(v0), bytes(v1)))
+    return pairs
+
+
+def is_useful_token(token):
+    """过滤全 0 / 全 0xFF 之类几乎不可能带来新路径的操作数"""
+    return len(token) >= 2 and token.strip(b"\x00") != b"" and token.strip(b"\xff") != b""
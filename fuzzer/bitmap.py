@@ -0,0 +1,115 @@
+import os
+import re
+import struct
+import hashlib
+import subprocess
+
+# numpy 可选：有则按 8 字节字向量化扫描，没有则退回正则扫描 (同样在 C 层完成)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 经典 afl-gcc/afl-clang 插装固定使用 64KB；AFL++ PCGUARD/LTO 会按边数申请更大的位图
+DEFAULT_MAP_SIZE = 65536
+MAX_MAP_SIZE = 8 * 1024 * 1024
+# 位图按 64 字节对齐 (与 AFL++ 一致)
+CHUNK_SIZE = 64
+# 按下标清零每个字约 3ns，整块 memset 每个字约 0.3ns：脏字超过总字数的 1/10 时整块清零更快
+SPARSE_CLEAR_RATIO = 10
+
+NONZERO_RE = re.compile(rb"[^\x00]")
+# 无 numpy 时先按页做 memcmp 跳过全零页，只对脏页做正则扫描
+PAGE_SIZE = 4096
+ZERO_PAGE = b"\x00" * PAGE_SIZE
+
+
+def align_map_size(size):
+    """向上取整到 CHUNK_SIZE 的倍数，并限制在 [CHUNK_SIZE, MAX_MAP_SIZE] 内"""
+    size = (size + CHUNK_SIZE - 1) // CHUNK_SIZE * CHUNK_SIZE
+    if size > MAX_MAP_SIZE:
+        # 位图小于目标的边数时，超出部分的边会写出界或被丢弃，覆盖率会偏低，必须让用户看到
+        print(f"[!] Target requests a {size} byte coverage map, capped at {MAX_MAP_SIZE}; "
+              f"edges beyond the cap will not be tracked")
+        return MAX_MAP_SIZE
+    return max(size, CHUNK_SIZE)
+
+
+def negotiate_map_size(target_path, env=None):
+    """
+    确定目标所需的位图大小：
+    1. 环境变量 AFL_MAP_SIZE (用户显式指定) 优先；
+    2. 否则以 AFL_DUMP_MAP_SIZE=1 运行一次目标，AFL++ 插装的程序会打印所需大小后直接退出；
+    3. 都拿不到时退回 DEFAULT_MAP_SIZE。
+    """
+    env = dict(os.environ if env is None else env)
+    if env.get("AFL_MAP_SIZE"):
+        try:
+            return align_map_size(int(env["AFL_MAP_SIZE"]))
+        except ValueError:
+            print(f"[!] Ignoring invalid AFL_MAP_SIZE={env['AFL_MAP_SIZE']}")
+
+    env["AFL_DUMP_MAP_SIZE"] = "1"
+    try:
+        out = subprocess.run([target_path], env=env, stdin=subprocess.DEVNULL,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=5).stdout
+        # 只接受纯数字输出，防止把普通程序的输出误当作位图大小
+        m = re.fullmatch(rb"\s*(\d+)\s*", out)
+        if m and int(m.group(1)) > 0:
+            return align_map_size(int(m.group(1)))
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return DEFAULT_MAP_SIZE
+
+
+def new_scan_mask(map_size):
+    """为 scan_map 预分配的布尔掩码 (每个 8 字节字一项)，避免每次执行都分配与位图等长的临时数组"""
+    return np.empty(map_size // 8, dtype=bool) if np is not None else None
+
+
+def scan_map(bitmap, mask=None):
+    """
+    扫描位图，返回 (indices, dirty_words)：indices 为非零字节的下标 (升序)，
+    dirty_words 为非零 8 字节字的下标 (numpy 数组，可直接用于清零；无 numpy 时为 None)。
+    bitmap 可以是 bytes，也可以是直接挂在共享内存上的 memoryview，后者不做拷贝。
+    边可能落在位图任意位置，每个字都要比较一次：numpy 下这是一遍写入预分配掩码的向量化比较，
+    之后只展开非零的 8 字节字；无 numpy 时逐页与全零页比较，只对脏页做正则扫描。
+    """
+    if np is not None and len(bitmap) % 8 == 0:
+        words = np.frombuffer(bitmap, dtype=np.uint64)
+        if mask is None or len(mask) != len(words):
+            mask = np.empty(len(words), dtype=bool)
+        np.not_equal(words, 0, out=mask)
+        dirty = np.flatnonzero(mask)
+        if not len(dirty):
+            return [], dirty
+        # 按内存顺序把非零字拆成字节，与主机字节序无关
+        nz = np.flatnonzero(words[dirty].view(np.uint8))
+        return (dirty[nz >> 3] * 8 + (nz & 7)).tolist(), dirty
+    indices = []
+    for page in range(0, len(bitmap), PAGE_SIZE):
+        chunk = bytes(bitmap[page:page + PAGE_SIZE])
+        if chunk != ZERO_PAGE[:len(chunk)]:
+            indices.extend(page + m.start() for m in NONZERO_RE.finditer(chunk))
+    return indices, None
+
+
+def word_view(buf):
+    """把可写的位图视图按 8 字节字解释，用于按 scan_map 返回的 dirty_words 就地清零；不可用时返回 None"""
+    if np is None or buf is None or len(buf) % 8:
+        return None
+    words = np.frombuffer(buf, dtype=np.uint64)
+    return words if words.flags.writeable else None
+
+
+def touched_indices(bitmap, mask=None):
+    """返回位图中非零字节的下标 (升序)，见 scan_map"""
+    return scan_map(bitmap, mask)[0]
+
+
+def coverage_hash(bitmap, indices):
+    """稀疏哈希：只对命中的 (下标, 计数) 求哈希，代替对整个位图求 md5"""
+    h = hashlib.md5()
+    for i in indices:
+        h.update(struct.pack("<IB", i, bitmap[i]))
+    return h.hexdigest()
@@ -2,8 +2,10 @@ import os
 import subprocess
 import sysv_ipc
 
+import bitmap
+
 TARGET_PATH = "./target/target_instrumented"
-MAP_SIZE = 65536
+MAP_SIZE = bitmap.negotiate_map_size(TARGET_PATH)
 
 
 def test_input(input_str):
@@ -13,6 +15,7 @@ def test_input(input_str):
 
     test_env = os.environ.copy()
     test_env["__AFL_SHM_ID"] = str(shm.id)
+    test_env["AFL_MAP_SIZE"] = str(MAP_SIZE)
 
     data = input_str.encode()
     proc = subprocess.Popen(
@@ -24,9 +27,9 @@ def test_input(input_str):
     )
     proc.communicate(input=data)
 
-    bitmap = shm.read(MAP_SIZE)
+    trace = shm.read(MAP_SIZE)
 
-    covered_edges = sum(1 for byte in bitmap if byte > 0)
+    covered_edges = len(bitmap.touched_indices(trace))
 
     shm.detach()
     shm.remove()
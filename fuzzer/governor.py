@@ -0,0 +1,220 @@
+import os
+import math
+import time
+import select
+import signal
+import subprocess
+from collections import namedtuple
+
+# resource / wait4 只在 Unix 上可用；Windows 调试时退回 Popen.wait，不做资源限制
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# 一次执行的结果。user_us + sys_us 是子进程真正消耗的 CPU 时间，不含调度等待。
+# 不记录 ru_maxrss：Linux 在 fork/exec 时把父进程的 RSS 高水位带给子进程，它反映的是 Fuzzer 自身的内存
+ExecResult = namedtuple("ExecResult", "returncode timed_out wall_us user_us sys_us")
+
+
+def cgroup_v2_available():
+    """只有统一层级 (cgroup v2) 挂载在 /sys/fs/cgroup 时才返回 True"""
+    return os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers"))
+
+
+def wait_child(pid, timeout):
+    """
+    等待子进程结束并用 wait4 回收，返回 (status, rusage)；超时返回 None (子进程仍在运行)。
+    优先用 pidfd + poll 精确等待，旧内核/旧 Python 上退回 WNOHANG 轮询。
+    """
+    if hasattr(os, "pidfd_open"):
+        try:
+            fd = os.pidfd_open(pid)
+        except OSError:
+            fd = None
+        if fd is not None:
+            try:
+                poller = select.poll()
+                poller.register(fd, select.POLLIN)
+                if not poller.poll(timeout * 1000):
+                    return None
+            finally:
+                os.close(fd)
+            _, status, rusage = os.wait4(pid, 0)
+            return status, rusage
+
+    deadline = time.monotonic() + timeout
+    delay = 0.0001
+    while True:
+        wpid, status, rusage = os.wait4(pid, os.WNOHANG)
+        if wpid:
+            return status, rusage
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.005)
+
+
+def kill_group(pid):
+    """SIGKILL 子进程所在的进程组 (start_new_session 时组号即子进程 pid)，连带孙进程"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class ResourceGovernor:
+    """
+    目标进程的资源策略：
+    - mem_limit_mb: 内存上限 (同 AFL 的 -m)。有 cgroup v2 时写 memory.max，否则用 RLIMIT_AS；
+    - RLIMIT_CORE=0 禁止生成 core 文件，崩溃样本多时 core dump 会拖慢整台机器；
+    - RLIMIT_CPU 作为兜底，防止逃出进程组的孙进程一直占用 CPU；
+    - 每次执行都放进独立进程组，超时时连同孙进程一起杀掉并回收，不留僵尸进程。
+
+    不使用 preexec_fn：它会让 subprocess 放弃 vfork，在子进程里跑解释器代码，
+    这部分 fork 与页表拷贝/释放的开销会记到目标的 rusage 上 (Fuzzer 进程越大越明显)。
+    RLIMIT_CORE 在 Fuzzer 进程上设置一次由子进程继承，其余限制在 spawn 之后立即施加。
+    """
+
+    def __init__(self, name, mem_limit_mb=None, exec_timeout=0.1, use_cgroup=False):
+        self.mem_limit_mb = mem_limit_mb
+        self.exec_timeout = exec_timeout
+        self.cpu_limit_s = int(math.ceil(exec_timeout)) + 1
+        self.cgroup_dir = None
+        self.cgroup_procs_fd = None
+        if resource is None:
+            return
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        if use_cgroup:
+            self.cgroup_dir = self._create_cgroup(name)
+        if self.cgroup_dir:
+            # 保持 cgroup.procs 打开，每次执行只需一次 write
+            self.cgroup_procs_fd = os.open(os.path.join(self.cgroup_dir, "cgroup.procs"), os.O_WRONLY)
+
+    def _create_cgroup(self, name):
+        """在当前进程所在的 cgroup 下建子组；没有 v2、没有权限或未开启 memory 控制器时返回 None"""
+        if not cgroup_v2_available():
+            print("[!] cgroup v2 not available, falling back to rlimits")
+            return None
+        try:
+            with open("/proc/self/cgroup") as f:
+                own = next(line.split(":", 2)[2].strip() for line in f if line.startswith("0::"))
+            path = os.path.join(CGROUP_ROOT, own.lstrip("/"), f"fuzz_{name}_{os.getpid()}")
+            os.makedirs(path, exist_ok=True)
+            if self.mem_limit_mb:
+                if not os.path.exists(os.path.join(path, "memory.max")):
+                    os.rmdir(path)
+                    print("[!] cgroup memory controller not delegated, falling back to rlimits")
+                    return None
+                with open(os.path.join(path, "memory.max"), "w") as f:
+                    f.write(str(self.mem_limit_mb * 1024 * 1024))
+                # 不允许用 swap 绕过内存上限；部分内核没有该文件，忽略即可
+                try:
+                    with open(os.path.join(path, "memory.swap.max"), "w") as f:
+                        f.write("0")
+                except OSError:
+                    pass
+            print(f"[*] Target processes placed in cgroup {path}")
+            return path
+        except (OSError, StopIteration) as e:
+            print(f"[!] Cannot create cgroup ({e}), falling back to rlimits")
+            return None
+
+    def _limit_child(self, pid):
+        """
+        spawn 返回后立即把子进程放进 cgroup，或用 prlimit 设置 RLIMIT_AS / RLIMIT_CPU。
+        从 exec 到这里只有几十微秒不受限，对防止病态输入吃光内存已经足够。
+        """
+        try:
+            if self.cgroup_procs_fd is not None:
+                os.write(self.cgroup_procs_fd, str(pid).encode())
+            elif self.mem_limit_mb:
+                limit = self.mem_limit_mb * 1024 * 1024
+                resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+            resource.prlimit(pid, resource.RLIMIT_CPU, (self.cpu_limit_s, self.cpu_limit_s + 1))
+        except ProcessLookupError:
+            # 子进程已经退出 (尚未回收)，不需要再限制
+            pass
+
+    def run(self, args, env, stdin_path=None, timeout=None):
+        """
+        执行一次目标并返回 ExecResult。stdin_path 不为空时把该文件作为标准输入
+        (与 AFL 一样用文件而不是管道，避免目标不读输入时写管道阻塞)。
+        """
+        timeout = self.exec_timeout if timeout is None else timeout
+        stdin = open(stdin_path, "rb") if stdin_path else subprocess.DEVNULL
+        try:
+            start = time.perf_counter_ns()
+            if resource is None:
+                proc = subprocess.Popen(args, stdin=stdin, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL, env=env)
+                try:
+                    proc.wait(timeout=timeout)
+                    timed_out = False
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    proc.wait()
+                    timed_out = True
+                wall_us = (time.perf_counter_ns() - start) // 1000
+                return ExecResult(proc.returncode, timed_out, wall_us, wall_us, 0)
+
+            proc = subprocess.Popen(args, stdin=stdin, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL, env=env, start_new_session=True)
+        finally:
+            if stdin_path:
+                stdin.close()
+
+        try:
+            self._limit_child(proc.pid)
+            waited = wait_child(proc.pid, timeout)
+        except BaseException:
+            # 子进程已经 exec，不能让它脱离管控继续运行：杀掉整个进程组并回收后再抛出
+            kill_group(proc.pid)
+            try:
+                os.wait4(proc.pid, 0)
+            except ChildProcessError:
+                pass
+            proc.returncode = -signal.SIGKILL
+            raise
+
+        timed_out = waited is None
+        if timed_out:
+            kill_group(proc.pid)
+            waited = os.wait4(proc.pid, 0)[1:]
+        wall_us = (time.perf_counter_ns() - start) // 1000
+
+        status, rusage = waited
+        # 已经用 wait4 回收，手动写回 returncode，避免 Popen 之后再去 waitpid
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # RLIMIT_CPU 触发的 SIGXCPU 本质上也是超时
+        if proc.returncode == -signal.SIGXCPU:
+            timed_out = True
+        return ExecResult(proc.returncode, timed_out, wall_us,
+                          int(rusage.ru_utime * 1000000), int(rusage.ru_stime * 1000000))
+
+    def peak_memory_kb(self):
+        """
+        目标进程的内存峰值 (KB)：cgroup 的 memory.peak，只统计放进该组的目标进程 (含其页缓存)，
+        是所有执行中的最大值。没有 cgroup 时无法得到可信的值，返回 None。
+        """
+        if not self.cgroup_dir:
+            return None
+        try:
+            with open(os.path.join(self.cgroup_dir, "memory.peak")) as f:
+                return int(f.read()) // 1024
+        except (OSError, ValueError):
+            # memory.peak 需要 5.19 及以上的内核
+            return None
+
+    def cleanup(self):
+        """删除本实例创建的 cgroup (组内进程都已回收后才能删除)"""
+        if self.cgroup_procs_fd is not None:
+            os.close(self.cgroup_procs_fd)
+            self.cgroup_procs_fd = None
+        if self.cgroup_dir:
+            try:
+                os.rmdir(self.cgroup_dir)
+            except OSError:
+                pass
@@ -4,10 +4,14 @@ import random
 import time
 import sys
 import struct
-import hashlib
 import platform
 import argparse
 
+import autodict
+import bitmap
+import governor
+import mutators
+
 # --- 兼容性检查 ---
 try:
     import sysv_ipc
@@ -24,15 +28,32 @@ except ImportError:
             class SharedMemory:
                 def __init__(self, *args, **kwargs): self.id = 123
                 def remove(self): pass
-                def write(self, data): pass
-                def read(self, size): return b'\x00' * size
+                def write(self, data, offset=0): pass
+                def read(self, size, offset=0): return b'\x00' * size
         sysv_ipc = MockShm()
     else:
         print("[-] 错误: 缺少 'sysv_ipc' 模块。请运行: pip install sysv_ipc")
         sys.exit(1)
 
 # --- 配置区 ---
-MAP_SIZE = 65536
+# 位图大小按目标协商 (见 bitmap.negotiate_map_size)，不再写死 64KB
+
+# --- 跨目标语料同步 (Format-group Sync) ---
+SYNC_INTERVAL = 60      # 两次同步之间的间隔 (秒)
+SYNC_MAX_IMPORTS = 20   # 每轮最多执行的外部种子数
+SYNC_EXEC_RATIO = 0.05  # 同步执行次数不超过上轮以来本地执行次数的 5%
+
+# --- 执行与资源管控 ---
+EXEC_TIMEOUT = 0.1      # 单次执行的墙钟超时 (秒)
+CMPLOG_TIMEOUT = 1      # CmpLog 二进制插装开销大，单独放宽
+MAX_LOGGED_ERRORS = 5   # 执行异常只打印前几次，之后只计数
+
+# --- 自动字典 / CmpLog ---
+MAX_DICT_SIZE = 1024    # 字典 token 总数上限 (手写 + 自动提取)
+MAX_CMP_PAIRS = 512     # 保留的 CmpLog 比较操作数对上限 (用于 Input-to-State 替换)
+
+# --- 结构感知变异 ---
+STRUCT_MUTATION_RATIO = 0.25  # mutate() 直接走格式感知算子的概率
 
 # --- 感兴趣值 (Magic Numbers) ---
 INTERESTING_8 = [-128, -1, 0, 1, 16, 32, 64, 100, 127]
@@ -41,7 +62,8 @@ INTERESTING_32 = [-2147483648, -100663046, -32769, 32768, 65536, 100000, 2147483
 
 
 class GreyBoxFuzzer:
-    def __init__(self, target_path, dict_path=None):
+    def __init__(self, target_path, dict_path=None, sync_group=None, auto_dict=False, cmplog_path=None,
+                 input_format=None, mem_limit_mb=None, use_cgroup=False):
         self.target_path = target_path
         self.target_name = os.path.basename(target_path)
 
@@ -57,9 +79,14 @@ class GreyBoxFuzzer:
              self.temp_file_path = os.path.join(os.path.dirname(self.target_path), f".cur_input_{self.target_name}")
 
         # 加载字典
+        # dictionary 按 token_hits (带来新覆盖的次数) 降序排列，_pick_token 偏向前排
         self.dictionary = []
+        self.dictionary_set = set()
+        self.token_hits = {}
+        self.cur_tokens = []  # 当前用例使用过的 token，发现新路径时记功
         if dict_path and os.path.exists(dict_path):
             print(f"[*] Loading dictionary from: {dict_path}")
+            tokens = []
             try:
                 with open(dict_path, "r", encoding="utf-8", errors="ignore") as f:
                     for line in f:
@@ -70,15 +97,33 @@ class GreyBoxFuzzer:
                             token = line[1:-1]
                             try:
                                 # 尝试解析转义
-                                self.dictionary.append(token.encode('utf-8').decode('unicode_escape').encode('latin1'))
+                                tokens.append(token.encode('utf-8').decode('unicode_escape').encode('latin1'))
                             except:
-                                self.dictionary.append(token.encode())
+                                tokens.append(token.encode())
                         else:
-                            self.dictionary.append(line.encode())
+                            tokens.append(line.encode())
             except Exception as e:
                 print(f"[!] Error loading dictionary: {e}")
+            self.add_dict_tokens(tokens)
             print(f"[*] Loaded {len(self.dictionary)} dictionary tokens.")
 
+        # 结构感知变异算子：按输入格式选择 (elf/xml/json/pcap)
+        self.struct_mutators = mutators.FORMAT_MUTATORS.get(input_format, [])
+        if self.struct_mutators:
+            print(f"[*] Format-aware mutators: {input_format} ({len(self.struct_mutators)} operators)")
+        self.cur_struct_op = None  # 当前用例使用过的格式感知算子
+        # 有效解析率统计：[执行次数, 退出码为 0 的次数]，退出码 0 近似视为输入通过了解析
+        self.struct_stats = {fn.__name__: [0, 0] for fn in self.struct_mutators}
+        self.generic_stats = [0, 0]
+
+        # 自动字典：从目标二进制提取字符串和比较立即数
+        if auto_dict:
+            try:
+                added = self.add_dict_tokens(autodict.extract_binary_tokens(target_path))
+                print(f"[*] Auto-dictionary: {added} tokens extracted from {self.target_name}")
+            except Exception as e:
+                print(f"[!] Error extracting auto-dictionary: {e}")
+
         # === 新增：AFL风格目录结构 ===
         self.target_out_dir = os.path.join(self.out_dir, self.target_name)
         self.queue_dir = os.path.join(self.target_out_dir, "queue")
@@ -101,28 +146,81 @@ class GreyBoxFuzzer:
         # 初始化 fuzzer_stats
         self.fuzzer_stats_file = os.path.join(self.target_out_dir, "fuzzer_stats")
 
+        # 同步组：同组 (同一输入格式) 的 Fuzzer 通过 out/targetX/sync_group 互相发现
+        self.sync_group = sync_group
+        sync_group_file = os.path.join(self.target_out_dir, "sync_group")
+        if sync_group:
+            with open(sync_group_file, "w") as f:
+                f.write(sync_group)
+        elif os.path.exists(sync_group_file):
+            os.remove(sync_group_file)
+        self.sync_seen = {}  # sibling_name -> 已处理过的 queue 文件名集合
+        self.paths_imported = 0
+        self.last_sync_time = time.time()
+        self.execs_at_last_sync = 0
+
         if not os.path.exists(self.out_dir):
             os.makedirs(self.out_dir)
 
         # 监控组件 & 插装对接
+        # 位图大小协商：AFL_MAP_SIZE > 目标自报 (AFL_DUMP_MAP_SIZE) > 默认 64KB
+        self.map_size = bitmap.negotiate_map_size(target_path)
+        self.zero_map = b'\x00' * self.map_size
+        self.dirty_words = None  # 上次执行写过的 8 字节字下标；None 表示需要整块清零
+        print(f"[*] Coverage map size: {self.map_size} bytes")
         try:
             self.shm = sysv_ipc.SharedMemory(None, flags=sysv_ipc.IPC_CREAT | sysv_ipc.IPC_EXCL, mode=0o600,
-                                             size=MAP_SIZE)
+                                             size=self.map_size)
         except sysv_ipc.ExistentialError:
             # 如果共享内存没清理干净，尝试新建一个
-            self.shm = sysv_ipc.SharedMemory(None, flags=sysv_ipc.IPC_CREAT, mode=0o600, size=MAP_SIZE)
+            self.shm = sysv_ipc.SharedMemory(None, flags=sysv_ipc.IPC_CREAT, mode=0o600, size=self.map_size)
         except Exception:
             # Fallback for Windows/Mock
-             self.shm = sysv_ipc.SharedMemory(None, flags=sysv_ipc.IPC_CREAT, mode=0o600, size=MAP_SIZE)
+             self.shm = sysv_ipc.SharedMemory(None, flags=sysv_ipc.IPC_CREAT, mode=0o600, size=self.map_size)
+
+        # sysv_ipc 的 SharedMemory 支持 buffer 协议：直接在已挂载的共享段上扫描，不再每次 read() 拷贝整张位图
+        try:
+            self.map_view = memoryview(self.shm)[:self.map_size]
+        except TypeError:
+            self.map_view = None
+        self.scan_mask = bitmap.new_scan_mask(self.map_size)
+        self.map_words = bitmap.word_view(self.map_view)
 
         self.env = os.environ.copy()
         if hasattr(self.shm, 'id'):
             self.env["__AFL_SHM_ID"] = str(self.shm.id)
+        # 告诉 AFL++ 插装的目标共享内存的实际大小
+        self.env["AFL_MAP_SIZE"] = str(self.map_size)
+
+        # CmpLog (可选)：AFL++ CmpLog 插装的同源二进制，用于捕获运行时比较操作数
+        self.cmplog_path = None
+        self.cmplog_shm = None
+        self.cmp_pairs = []
+        if cmplog_path:
+            try:
+                self.cmplog_shm = sysv_ipc.SharedMemory(None, flags=sysv_ipc.IPC_CREAT | sysv_ipc.IPC_EXCL, mode=0o600,
+                                                        size=autodict.CMPLOG_MAP_SIZE)
+                self.cmplog_path = cmplog_path
+                self.cmplog_env = self.env.copy()
+                self.cmplog_env["__AFL_CMPLOG_SHM_ID"] = str(self.cmplog_shm.id)
+                print(f"[*] CmpLog enabled: {cmplog_path}")
+            except Exception as e:
+                print(f"[!] CmpLog disabled, cannot create shared memory: {e}")
         
         self.unique_crashes = set()  # 新增：用于Crash去重
         self.global_visited_indices = set()
         self.total_execs = 0  # 新增：总执行次数用于计算速度
+
+        # === 资源管控 ===
+        # 内存上限 / 禁止 core dump / 可选 cgroup v2；每次执行用 wait4 回收并取得真实 CPU 时间
+        self.governor = governor.ResourceGovernor(self.target_name, mem_limit_mb=mem_limit_mb,
+                                                  exec_timeout=EXEC_TIMEOUT, use_cgroup=use_cgroup)
+        self.total_cpu_us = 0       # 目标进程累计 user + sys CPU 时间
+        self.total_sys_us = 0
+        self.slowest_exec_us = 0
+        self.exec_errors = 0        # 启动失败等异常次数，前几次会打印原因
         self.start_time = time.time()
+        self.last_log_time = self.start_time
         
         # === 种子优选 (Favored) ===
         # top_rated[edge_idx] = { 'factor': len*time, 'id': index_in_corpus }
@@ -233,10 +331,71 @@ class GreyBoxFuzzer:
             
         return bytes(res)
 
+    # === 字典管理 ===
+    def add_dict_tokens(self, tokens):
+        """去重后追加到字典末尾，返回实际新增的数量"""
+        added = 0
+        for token in tokens:
+            if len(self.dictionary) >= MAX_DICT_SIZE:
+                break
+            if token and token not in self.dictionary_set:
+                self.dictionary.append(token)
+                self.dictionary_set.add(token)
+                added += 1
+        return added
+
+    def _pick_token(self):
+        """按排名偏向选择：排在前面 (产出新覆盖多) 的 token 被选中的概率更高"""
+        token = self.dictionary[int(len(self.dictionary) * random.random() ** 2)]
+        self.cur_tokens.append(token)
+        return token
+
+    def credit_tokens(self):
+        """当前用例发现了新路径：给用到的 token 记功，并重新排序字典"""
+        if not self.cur_tokens:
+            return
+        for token in set(self.cur_tokens):
+            self.token_hits[token] = self.token_hits.get(token, 0) + 1
+        # 稳定排序：未命中过的 token 保持原有顺序 (手写字典在前)
+        self.dictionary.sort(key=lambda t: -self.token_hits.get(t, 0))
+
+    def run_cmplog(self, data, run_args, use_stdin):
+        """用 CmpLog 二进制执行一次，把比较操作数并入字典和 cmp_pairs"""
+        if not self.cmplog_path:
+            return
+        self.cmplog_shm.write(b'\x00' * (autodict.CMP_MAP_W * autodict.CMP_HEADER_SIZE), 0)
+        cmplog_args = [self.cmplog_path] + run_args[1:]
+
+        with open(self.temp_file_path, "wb") as f:
+            f.write(data)
+        try:
+            result = self.governor.run(cmplog_args, self.cmplog_env, timeout=CMPLOG_TIMEOUT,
+                                       stdin_path=self.temp_file_path if use_stdin else None)
+            if result.timed_out:
+                return
+        except (OSError, subprocess.SubprocessError) as e:
+            self.record_exec_error(e)
+            return
+        finally:
+            # CmpLog 二进制同样写入覆盖率位图，下次执行前需要整块清零
+            self.dirty_words = None
+
+        pairs = autodict.parse_cmplog_map(self.cmplog_shm)
+        tokens = []
+        for v0, v1 in pairs:
+            tokens.extend(t for t in (v0, v1) if autodict.is_useful_token(t))
+        self.add_dict_tokens(tokens)
+
+        known = set(self.cmp_pairs)
+        for pair in pairs:
+            if pair not in known and len(self.cmp_pairs) < MAX_CMP_PAIRS:
+                self.cmp_pairs.append(pair)
+                known.add(pair)
+
     def _dict_mutation(self, data):
         """字典变异：插入或覆盖关键字"""
         if not self.dictionary or not data: return data
-        token = random.choice(self.dictionary)
+        token = self._pick_token()
         res = bytearray(data)
         
         # 策略A: 插入
@@ -251,6 +410,40 @@ class GreyBoxFuzzer:
             
         return bytes(res)
 
+    def _i2s_mutation(self, data):
+        """Input-to-State 替换：输入中出现了比较的一侧操作数，就把它换成另一侧"""
+        if not self.cmp_pairs or not data: return data
+        for _ in range(8):
+            v0, v1 = random.choice(self.cmp_pairs)
+            if random.random() < 0.5:
+                v0, v1 = v1, v0
+            pos = data.find(v0)
+            if pos >= 0:
+                return data[:pos] + v1 + data[pos + len(v0):]
+        return data
+
+    def _byte_mutation(self, data):
+        """给格式感知算子用的字节级变异：对结构内部的一段数据叠加 1~4 次基础算子"""
+        ops = [self._bitflip, self._byteflip, self._arith, self._interest]
+        if self.dictionary:
+            ops.append(self._dict_mutation)
+        for _ in range(random.randint(1, 4)):
+            data = random.choice(ops)(data)
+        return data
+
+    def _struct_mutation(self, data):
+        """格式感知变异：解析失败 (返回 None) 时原样返回，由其他算子继续变异"""
+        if not self.struct_mutators or not data: return data
+        operator = random.choice(self.struct_mutators)
+        try:
+            res = operator(data, self._byte_mutation)
+        except (struct.error, IndexError, ValueError):
+            res = None  # 畸形输入上的解析错误，当作无法解析处理
+        if res is None:
+            return data
+        self.cur_struct_op = operator.__name__
+        return res
+
     def _havoc(self, data):
         res = data
         # 增强 Havoc：增加堆叠次数 (4-16)
@@ -259,6 +452,10 @@ class GreyBoxFuzzer:
             ops = [self._bitflip, self._byteflip, self._arith, self._interest, self._block_ops]
             if self.dictionary:
                 ops.append(self._dict_mutation)
+            if self.cmp_pairs:
+                ops.append(self._i2s_mutation)
+            if self.struct_mutators:
+                ops.append(self._struct_mutation)
             # 偶尔允许在 havoc 中拼接
             if len(self.corpus) > 1:
                 ops.append(self.splice)
@@ -273,6 +470,10 @@ class GreyBoxFuzzer:
 
     def mutate(self, data):
         if not data: return b"a" * 10
+        if self.struct_mutators and random.random() < STRUCT_MUTATION_RATIO:
+            res = self._struct_mutation(data)
+            if self.cur_struct_op:
+                return res
         rand = random.random()
         
         # 调整调度概率
@@ -304,13 +505,12 @@ class GreyBoxFuzzer:
         return min(max(5, energy), 100)
 
     # === 种子优选逻辑 (参考 AFL update_bitmap_score) ===
-    def update_bitmap_score(self, candidate_data, bitmap, exec_us):
+    def update_bitmap_score(self, candidate_data, current_indices, exec_us):
         """
         检查当前种子是否比现有的更'优秀'（更短、更快）。
         如果是，更新 top_rated 并标记该种子为 favored。
         """
-        # 1. 解析 Bitmap 覆盖的边
-        current_indices = [i for i, v in enumerate(bitmap) if v > 0]
+        # 1. current_indices 为本次覆盖的边 (由 bitmap.touched_indices 稀疏提取)
         if not current_indices: return
 
         # 2. 将种子加入元数据列表
@@ -362,12 +562,14 @@ class GreyBoxFuzzer:
             f.write(data)
         print(f"\n[!] 🚨 Found New Crash! Saved to {filename}")
 
-    def save_seed(self, data):
-        """保存感兴趣的种子到 queue"""
-        filename = f"id:{len(self.corpus):06d},src:000000,op:havoc,rep:1"
+    def save_seed(self, data, origin="src:000000,op:havoc,rep:1"):
+        """保存感兴趣的种子到 queue。先写同目录下的隐藏临时文件再原子改名，同组 Fuzzer 不会读到写了一半的条目。"""
+        filename = f"id:{len(self.corpus):06d},{origin}"
         filepath = os.path.join(self.queue_dir, filename)
-        with open(filepath, "wb") as f:
+        tmp_path = os.path.join(self.queue_dir, f".{filename}.tmp")
+        with open(tmp_path, "wb") as f:
             f.write(data)
+        os.replace(tmp_path, filepath)
             
     def update_monitor(self, current_time, last_update_time):
         """更新监控状态文件"""
@@ -385,25 +587,43 @@ class GreyBoxFuzzer:
             f.write(f"paths_total       : {len(self.corpus)}\n")
             f.write(f"paths_favored     : {len(self.corpus)}\n")
             f.write(f"paths_found       : {len(self.corpus)}\n")
-            f.write(f"paths_imported    : 0\n")
+            f.write(f"paths_imported    : {self.paths_imported}\n")
             f.write(f"max_depth         : 0\n")
             f.write(f"cur_path          : 0\n")
             f.write(f"pending_favs      : 0\n")
             f.write(f"pending_total     : 0\n")
             f.write(f"variable_paths    : 0\n")
             f.write(f"stability         : 100.00%\n")
-            f.write(f"bitmap_cvg        : 0.00%\n")
+            f.write(f"bitmap_cvg        : {len(self.global_visited_indices) / self.map_size * 100:.2f}%\n")
+            f.write(f"bitmap_size       : {self.map_size}\n")
             f.write(f"unique_crashes    : {len(self.unique_crashes)}\n")
             f.write(f"unique_hangs      : 0\n")
             f.write(f"last_path         : {int(last_update_time)}\n")
             f.write(f"last_crash        : 0\n")
             f.write(f"last_hang         : 0\n")
             f.write(f"execs_since_crash : {self.total_execs}\n")
-            f.write(f"exec_timeout      : 0\n")
+            f.write(f"exec_timeout      : {int(EXEC_TIMEOUT * 1000)}\n")
             f.write(f"afl_banner        : {self.target_name}\n")
             f.write(f"afl_version       : 4.07c\n")
             f.write(f"target_mode       : default\n")
             f.write(f"command_line      : {sys.argv[0]} {self.target_path}\n")
+            # 资源统计：目标进程的真实 CPU 开销与内存峰值 (来自 wait4)
+            f.write(f"mem_limit         : {self.governor.mem_limit_mb or 0}\n")
+            f.write(f"cgroup            : {self.governor.cgroup_dir or 'none'}\n")
+            f.write(f"avg_cpu_us        : {self.total_cpu_us // self.total_execs if self.total_execs else 0}\n")
+            f.write(f"slowest_exec_ms   : {self.slowest_exec_us // 1000}\n")
+            f.write(f"target_cpu_user_s : {(self.total_cpu_us - self.total_sys_us) / 1000000:.2f}\n")
+            f.write(f"target_cpu_sys_s  : {self.total_sys_us / 1000000:.2f}\n")
+            peak_kb = self.governor.peak_memory_kb()
+            if peak_kb is not None:
+                f.write(f"target_mem_peak_mb: {peak_kb // 1024}\n")
+            f.write(f"exec_errors       : {self.exec_errors}\n")
+            if self.struct_mutators:
+                struct_execs = sum(v[0] for v in self.struct_stats.values())
+                struct_valid = sum(v[1] for v in self.struct_stats.values())
+                f.write(f"struct_valid      : {struct_valid}/{struct_execs}\n")
+                f.write(f"generic_valid     : {self.generic_stats[1]}/{self.generic_stats[0]}\n")
+                f.write(f"struct_ops        : {' '.join(f'{k}={v[1]}/{v[0]}' for k, v in self.struct_stats.items())}\n")
 
         # 2. 追加 plot_data
         # unix_time, cycles_done, cur_path, paths_total, pending_total, pending_favs, map_size, unique_crashes, unique_hangs, max_depth, execs_per_sec
@@ -413,16 +633,217 @@ class GreyBoxFuzzer:
         # 3. 打印控制台状态行
         print(f"[*] Fuzzing test case #{self.total_execs} (stats: map={len(self.global_visited_indices)}, speed={execs_per_sec:.0f}/s, crashes={len(self.unique_crashes)}, paths={len(self.corpus)})")
 
+    # === 执行与覆盖率反馈 ===
+    def build_run_args(self, args_list, use_stdin):
+        """构造命令 (通用化)：如果 args_list 中包含 @@，则替换为临时文件名"""
+        run_args = []
+        for arg in args_list:
+            if "@@" in arg:
+                run_args.append(arg.replace("@@", self.temp_file_path))
+            else:
+                run_args.append(arg)
+
+        # 如果没有 @@ 且不使用 stdin，通常默认追加文件名在末尾 (兼容旧行为)
+        if not use_stdin and "@@" not in str(args_list):
+            run_args.append(self.temp_file_path)
+        return run_args
+
+    def clear_bitmap(self):
+        """只清零上次执行写过的字 (一次 numpy 赋值)；不知道写过哪里或没有可写视图时整块清零"""
+        if not hasattr(self.shm, 'write'):
+            return
+        if (self.dirty_words is None or self.map_words is None
+                or len(self.dirty_words) * bitmap.SPARSE_CLEAR_RATIO > len(self.map_words)):
+            self.shm.write(self.zero_map)
+        elif len(self.dirty_words):
+            self.map_words[self.dirty_words] = 0
+        self.dirty_words = []
+
+    def read_bitmap(self):
+        """读取位图并稀疏提取命中的边，返回 (trace, indices)。trace 优先是共享段的视图，下次清零前有效。"""
+        trace = self.map_view if self.map_view is not None else self.shm.read(self.map_size)
+        indices, self.dirty_words = bitmap.scan_map(trace, self.scan_mask)
+        return trace, indices
+
+    def run_target(self, candidate, run_args, use_stdin):
+        """执行一次目标程序，返回 (indices, exec_us, returncode)，indices 为命中的边。Crash / 超时样本在这里直接保存。"""
+        self.clear_bitmap()
+
+        exec_us = 0 # 初始化，防止异常时未定义
+        # 输入一律写入临时文件；STDIN 模式下把该文件作为标准输入，避免写管道阻塞
+        with open(self.temp_file_path, "wb") as f:
+            f.write(candidate)
+
+        trace, indices = None, None # 初始化
+        returncode = None  # 超时或启动失败时保持 None
+        try:
+            result = self.governor.run(run_args, self.env, stdin_path=self.temp_file_path if use_stdin else None)
+        except (OSError, subprocess.SubprocessError) as e:
+            self.record_exec_error(e)
+            # 子进程可能已经写过位图，不知道写在哪里，下次执行前整块清零
+            self.dirty_words = None
+            return indices, exec_us, returncode
+
+        exec_us = self.record_exec_cost(result)
+        self.total_execs += 1
+
+        # 子进程已被回收，立即读取 bitmap
+        if hasattr(self.shm, 'read'):
+            trace, indices = self.read_bitmap()
+
+        if result.timed_out:
+            # 对于超时，也计算 hash 尝试去重
+            if trace:
+                self.save_crash(candidate, "timeout", bitmap.coverage_hash(trace, indices))  # 保存超时用例
+        else:
+            returncode = result.returncode
+            # 修复：检查 Crash (returncode < 0 代表被信号杀死)，只在崩溃时才计算 hash (用于去重)
+            if returncode < 0:
+                bitmap_hash = bitmap.coverage_hash(trace, indices) if trace else None
+                self.save_crash(candidate, f"sig{-returncode}", bitmap_hash)
+        return indices, exec_us, returncode
+
+    def record_exec_cost(self, result):
+        """
+        累计资源统计并返回用于调度的 exec_us。
+        优先用 wait4 拿到的 user + sys CPU 时间 (目标自身的开销)，不受 fork/exec 和调度抖动影响；
+        极短的执行 CPU 时间可能记为 0，此时退回 perf_counter 测得的墙钟时间。
+        """
+        cpu_us = result.user_us + result.sys_us
+        self.total_cpu_us += cpu_us
+        self.total_sys_us += result.sys_us
+        exec_us = max(cpu_us if cpu_us > 0 else result.wall_us, 1)
+        self.slowest_exec_us = max(self.slowest_exec_us, exec_us)
+        return exec_us
+
+    def record_exec_error(self, e):
+        """执行失败 (目标不存在、fork 失败等) 不再静默吞掉：计数，并打印前几次的原因"""
+        self.exec_errors += 1
+        if self.exec_errors <= MAX_LOGGED_ERRORS:
+            print(f"[!] Target execution failed: {e!r}")
+        elif self.exec_errors == MAX_LOGGED_ERRORS + 1:
+            print("[!] Further execution errors are only counted in fuzzer_stats (exec_errors)")
+
+    def record_valid_parse(self, returncode):
+        """按算子来源统计有效解析 (退出码 0) 的比例"""
+        stats = self.struct_stats[self.cur_struct_op] if self.cur_struct_op else self.generic_stats
+        stats[0] += 1
+        if returncode == 0:
+            stats[1] += 1
+
+    def has_new_coverage(self, indices):
+        """返回本次命中的边集合；没有新边时返回 None。只检查命中的边，与位图大小无关。"""
+        if not indices:
+            return None
+        visited = self.global_visited_indices
+        if all(i in visited for i in indices):
+            return None
+        return set(indices)
+
+    def add_new_path(self, candidate, exec_us, current_indices, origin="src:000000,op:havoc,rep:1"):
+        """把带来新覆盖的用例加入语料库，并记录日志"""
+        self.global_visited_indices.update(current_indices)
+        self.corpus.append(candidate)
+
+        # 调用优选评分
+        self.update_bitmap_score(candidate, current_indices, exec_us)
+
+        self.save_seed(candidate, origin)  # 新增：保存种子到 queue
+
+        elapsed = time.time() - self.start_time
+        speed = self.total_execs / elapsed if elapsed > 0 else 0
+        print(f"[+] New Path! Cov: {len(self.global_visited_indices)} | Execs: {self.total_execs} | Speed: {speed:.2f} execs/s")
+        # 立即写入
+        with open(self.stats_file, "a") as f:
+            f.write(
+                f"{time.time() - self.start_time:.2f},{len(self.global_visited_indices)},{self.total_execs}\n")
+
+        self.update_monitor(time.time(), time.time()) # 更新详细监控
+        self.last_log_time = time.time()
+
+    # === 跨目标语料同步 ===
+    def find_sync_siblings(self):
+        """扫描 out/ 下声明了同一 sync_group 的其他目标，返回 {name: queue_dir}"""
+        siblings = {}
+        if not self.sync_group:
+            return siblings
+        for name in os.listdir(self.out_dir):
+            if name == self.target_name:
+                continue
+            group_file = os.path.join(self.out_dir, name, "sync_group")
+            queue_dir = os.path.join(self.out_dir, name, "queue")
+            if not (os.path.isfile(group_file) and os.path.isdir(queue_dir)):
+                continue
+            try:
+                with open(group_file, "r") as f:
+                    if f.read().strip() == self.sync_group:
+                        siblings[name] = queue_dir
+            except OSError:
+                pass
+        return siblings
+
+    def sync_from_siblings(self, run_args, use_stdin):
+        """
+        导入同组 Fuzzer 的 queue 条目 (参考 AFL -M/-S 的 sync_fuzzers)。
+        每个条目都在本地目标上执行一次，只有带来本地新覆盖才保留。
+        执行次数受 SYNC_MAX_IMPORTS 与 SYNC_EXEC_RATIO 限制，未处理完的留到下一轮。
+        """
+        local_execs = self.total_execs - self.execs_at_last_sync
+        budget = min(SYNC_MAX_IMPORTS, max(1, int(local_execs * SYNC_EXEC_RATIO)))
+        imported = 0
+
+        for sibling, queue_dir in sorted(self.find_sync_siblings().items()):
+            seen = self.sync_seen.setdefault(sibling, set())
+            for filename in sorted(os.listdir(queue_dir)):
+                if budget <= 0:
+                    break
+                # 跳过已处理的、对方从别处导入的 (避免来回倒腾)，以及隐藏文件 (写入中的临时文件、.state 等)
+                if filename in seen or ",sync:" in filename or filename.startswith("."):
+                    continue
+                try:
+                    with open(os.path.join(queue_dir, filename), "rb") as f:
+                        data = f.read()
+                except OSError:
+                    continue
+                # 读取失败或为空时不标记为已处理，下一轮再看
+                if not data:
+                    continue
+                seen.add(filename)
+
+                budget -= 1
+                indices, exec_us, _ = self.run_target(data, run_args, use_stdin)
+                current_indices = self.has_new_coverage(indices)
+                if current_indices:
+                    self.paths_imported += 1
+                    imported += 1
+                    self.add_new_path(data, exec_us, current_indices,
+                                      origin=f"sync:{sibling},src:{filename[3:9]}")
+                    self.run_cmplog(data, run_args, use_stdin)
+
+        if imported:
+            print(f"[*] Sync: imported {imported} inputs from group '{self.sync_group}'")
+        self.last_sync_time = time.time()
+        self.execs_at_last_sync = self.total_execs
+
     # === 核心运行逻辑 ===
     def start(self, args_list, use_stdin=False, timeout=86400):
         print(f"[*] Fuzzing target: {self.target_name} | Timeout: {timeout}s")
         print(f"[*] Strategy: {'STDIN' if use_stdin else 'FILE (@@)'}")
+        if self.sync_group:
+            print(f"[*] Sync group: {self.sync_group} (every {SYNC_INTERVAL}s)")
 
         # 修复：增加 total_execs 列
         with open(self.stats_file, "w") as f:
             f.write("time,cov,total_execs\n")
 
-        last_log_time = time.time()
+        self.last_log_time = time.time()
+        run_args = self.build_run_args(args_list, use_stdin)
+
+        # CmpLog：先在初始种子上采集一次比较操作数
+        for seed in self.corpus:
+            self.run_cmplog(seed, run_args, use_stdin)
+        if self.cmplog_path:
+            print(f"[*] CmpLog: {len(self.cmp_pairs)} comparison pairs, {len(self.dictionary)} dictionary tokens")
 
         while time.time() - self.start_time < timeout:
             if not self.corpus: 
@@ -431,6 +852,10 @@ class GreyBoxFuzzer:
                 self.corpus_meta = [{'data': b"_Z1fv", 'len': 5, 'exec_us': 1000, 'favored': True}]
                 print("[!] Warning: No seeds found, using default b'_Z1fv'")
 
+            # 0. 定期从同组 Fuzzer 导入种子
+            if self.sync_group and time.time() - self.last_sync_time > SYNC_INTERVAL:
+                self.sync_from_siblings(run_args, use_stdin)
+
             # 1. 调度优化：基于 Favored 的加权选择
             # 优先选择被标记为 favored 的种子 (覆盖新路径且效率高)
             favored_indices = [i for i, meta in enumerate(self.corpus_meta) if meta.get('favored')]
@@ -456,108 +881,29 @@ class GreyBoxFuzzer:
                 current_seed = seed_data
                 if random.random() < 0.1:
                     current_seed = self.splice(current_seed)
+                self.cur_tokens = []
+                self.cur_struct_op = None
                 candidate = self.mutate(current_seed)
 
-                # 3. 构造命令 (通用化)
-                # 如果 args_list 中包含 @@，则替换为临时文件名
-                run_args = []
-                for arg in args_list:
-                    if "@@" in arg:
-                        run_args.append(arg.replace("@@", self.temp_file_path))
-                    else:
-                        run_args.append(arg)
-                
-                # 如果没有 @@ 且不使用 stdin，通常默认追加文件名在末尾 (兼容旧行为)
-                if not use_stdin and "@@" not in str(args_list):
-                     run_args.append(self.temp_file_path)
-
-                # 4. 执行
-                if hasattr(self.shm, 'write'):
-                    self.shm.write(b'\x00' * MAP_SIZE)
-
-                start_exec = time.time() # 计时开始
-                exec_us = 0 # 初始化，防止异常时未定义
-
-                if not use_stdin:
-                    with open(self.temp_file_path, "wb") as f:
-                        f.write(candidate)
-                    stdin_mode = subprocess.DEVNULL
-                else:
-                    stdin_mode = subprocess.PIPE
-                
-                bitmap = None # 初始化
-                try:
-                    # 修复：stdout=subprocess.DEVNULL 屏蔽乱码
-                    proc = subprocess.Popen(run_args, stdin=stdin_mode,
-                                            stdout=subprocess.DEVNULL,
-                                            stderr=subprocess.PIPE,
-                                            env=self.env)
-
-                    if use_stdin:
-                        proc.communicate(input=candidate, timeout=0.1)
-                    else:
-                        proc.communicate(timeout=0.1)
-
-                    exec_us = int((time.time() - start_exec) * 1000000) # 计算微秒
-                    self.total_execs += 1
-                    
-                    # 立即读取 bitmap 计算 hash (用于去重)
-                    if hasattr(self.shm, 'read'):
-                        bitmap = self.shm.read(MAP_SIZE)
-                        bitmap_hash = hashlib.md5(bitmap).hexdigest()
-
-                    # 修复：检查 Crash (returncode < 0 代表被信号杀死)
-                    if proc.returncode < 0:
-                        self.save_crash(candidate, f"sig{-proc.returncode}", bitmap_hash)
-
-                except subprocess.TimeoutExpired:
-                    proc.kill()
-                    # 超时也尝试读取 bitmap
-                    if bitmap is None and hasattr(self.shm, 'read'):
-                        bitmap = self.shm.read(MAP_SIZE)
-                    
-                    # 对于超时，也计算 hash 尝试去重
-                    if bitmap:
-                        bitmap_hash = hashlib.md5(bitmap).hexdigest()
-                        self.save_crash(candidate, "timeout", bitmap_hash)  # 保存超时用例
-                except Exception as e:
-                    pass
+                # 3. 执行
+                indices, exec_us, returncode = self.run_target(candidate, run_args, use_stdin)
+                self.record_valid_parse(returncode)
 
-                # 5. 覆盖率反馈
-                if bitmap is None and hasattr(self.shm, 'read'):
-                     bitmap = self.shm.read(MAP_SIZE)
-                
-                if bitmap:
-                    current_indices = set(i for i, v in enumerate(bitmap) if v > 0)
-
-                    if current_indices and not current_indices.issubset(self.global_visited_indices):
-                        self.global_visited_indices.update(current_indices)
-                        self.corpus.append(candidate)
-                        
-                        # 调用优选评分
-                        self.update_bitmap_score(candidate, bitmap, exec_us)
-                        
-                        self.save_seed(candidate)  # 新增：保存种子到 queue
-                        
-                        elapsed = time.time() - self.start_time
-                        speed = self.total_execs / elapsed if elapsed > 0 else 0
-                        print(f"[+] New Path! Cov: {len(self.global_visited_indices)} | Execs: {self.total_execs} | Speed: {speed:.2f} execs/s")
-                        # 立即写入
-                        with open(self.stats_file, "a") as f:
-                            f.write(
-                                f"{time.time() - self.start_time:.2f},{len(self.global_visited_indices)},{self.total_execs}\n")
-                        
-                        self.update_monitor(time.time(), time.time()) # 更新详细监控
-                        last_log_time = time.time()
+                # 4. 覆盖率反馈
+                current_indices = self.has_new_coverage(indices)
+                if current_indices:
+                    self.add_new_path(candidate, exec_us, current_indices)
+                    self.credit_tokens()
+                    self.run_cmplog(candidate, run_args, use_stdin)
 
                 # 心跳日志
-                if time.time() - last_log_time > 1.0:
+                if time.time() - self.last_log_time > 1.0:
                     with open(self.stats_file, "a") as f:
                         f.write(
                             f"{time.time() - self.start_time:.2f},{len(self.global_visited_indices)},{self.total_execs}\n")
                     
-                    self.update_monitor(time.time(), last_log_time) # 更新详细监控
-                    last_log_time = time.time()
+                    self.update_monitor(time.time(), self.last_log_time) # 更新详细监控
+                    self.last_log_time = time.time()
 
         # 清理
         if os.path.exists(self.temp_file_path):
@@ -575,6 +921,14 @@ if __name__ == "__main__":
     parser.add_argument("-s", "--stdin", action="store_true", help="Use STDIN instead of file input")
     parser.add_argument("-x", "--dict", help="Path to dictionary file")
     parser.add_argument("-i", "--input", help="Path to input seed directory")
+    parser.add_argument("-g", "--sync-group", help="Share queue entries with other targets in the same format group (e.g. elf, xml)")
+    parser.add_argument("--auto-dict", action="store_true", help="Extract dictionary tokens from the target binary")
+    parser.add_argument("--cmplog", help="Path to an AFL++ CmpLog-instrumented build of the target")
+    parser.add_argument("-m", "--mem-limit", type=int, help="Memory limit for the target in MB (like AFL's -m)")
+    parser.add_argument("--cgroup", action="store_true",
+                        help="Place target processes in a cgroup v2 group (memory.max) when available")
+    parser.add_argument("-f", "--format", choices=sorted(mutators.FORMAT_MUTATORS),
+                        help="Input format of the target, enables format-aware mutators")
     
     # 使用 parse_known_args 以避免 argparse 对 -- 后面的参数（如 -a）报错
     args, unknown = parser.parse_known_args()
@@ -595,7 +949,9 @@ if __name__ == "__main__":
     # 追加 unknown 中的参数
     run_args.extend(target_args)
 
-    f = GreyBoxFuzzer(args.target, dict_path=args.dict)
+    f = GreyBoxFuzzer(args.target, dict_path=args.dict, sync_group=args.sync_group,
+                      auto_dict=args.auto_dict, cmplog_path=args.cmplog, input_format=args.format,
+                      mem_limit_mb=args.mem_limit, use_cgroup=args.cgroup)
     
     # 手动指定种子目录
     if args.input:
@@ -606,3 +962,6 @@ if __name__ == "__main__":
     finally:
         if hasattr(f, 'shm') and hasattr(f.shm, 'remove'):
             f.shm.remove()
+        if f.cmplog_shm is not None:
+            f.cmplog_shm.remove()
+        f.governor.cleanup()
@@ -0,0 +1,367 @@
+import random
+import re
+import struct
+
+# 结构感知变异算子 (Format-aware Mutators)
+# 每个算子签名为 fn(data, mutate_bytes) -> bytes | None
+#   mutate_bytes: 由 Fuzzer 提供的字节级变异函数 (bitflip/arith/interest/字典)
+#   返回 None 表示输入无法按该格式解析，调用方应回退到普通变异
+
+# === ELF ===
+# 各字段在头部中的偏移，按 ELFCLASS 区分
+ELF_LAYOUT = {
+    True: {  # ELF64
+        "word": "Q", "phoff": 0x20, "shoff": 0x28, "phentsize": 0x36, "phnum": 0x38,
+        "shentsize": 0x3A, "shnum": 0x3C, "shstrndx": 0x3E,
+        "sh_type": 4, "sh_offset": 24, "sh_size": 32, "p_offset": 8, "p_filesz": 32, "p_memsz": 40,
+        # 可以随意改写而不破坏布局的字段: (偏移, 格式)
+        "ehdr_fields": [(0x10, "H"), (0x12, "H"), (0x14, "I"), (0x18, "Q"), (0x30, "I")],
+        "shdr_fields": [(4, "I"), (8, "Q"), (40, "I"), (44, "I"), (48, "Q"), (56, "Q")],
+    },
+    False: {  # ELF32
+        "word": "I", "phoff": 0x1C, "shoff": 0x20, "phentsize": 0x2A, "phnum": 0x2C,
+        "shentsize": 0x2E, "shnum": 0x30, "shstrndx": 0x32,
+        "sh_type": 4, "sh_offset": 16, "sh_size": 20, "p_offset": 4, "p_filesz": 16, "p_memsz": 20,
+        "ehdr_fields": [(0x10, "H"), (0x12, "H"), (0x14, "I"), (0x18, "I"), (0x24, "I")],
+        "shdr_fields": [(4, "I"), (8, "I"), (24, "I"), (28, "I"), (32, "I"), (36, "I")],
+    },
+}
+SHT_NOBITS = 8
+
+INTERESTING_FIELD_VALUES = [0, 1, 2, 3, 4, 7, 8, 16, 0x7F, 0x80, 0xFF, 0x100, 0x7FFF, 0xFFFF, 0x7FFFFFFF, 0xFFFFFFFF]
+
+
+def parse_elf(data):
+    """解析 ELF 头、节头表和程序头表的位置，失败返回 None"""
+    if data[:4] != b"\x7fELF" or len(data) < 0x34 or data[4] not in (1, 2):
+        return None
+    is64 = data[4] == 2
+    endian = "<" if data[5] != 2 else ">"
+    lay = ELF_LAYOUT[is64]
+    word = endian + lay["word"]
+    try:
+        elf = {
+            "is64": is64, "endian": endian, "layout": lay,
+            "phoff": struct.unpack_from(word, data, lay["phoff"])[0],
+            "shoff": struct.unpack_from(word, data, lay["shoff"])[0],
+        }
+        for key in ("phentsize", "phnum", "shentsize", "shnum", "shstrndx"):
+            elf[key] = struct.unpack_from(endian + "H", data, lay[key])[0]
+
+        # 表头超出文件范围 (被截断) 时当作没有该表，避免越界改写
+        if elf["shoff"] + elf["shnum"] * elf["shentsize"] > len(data) or elf["shentsize"] == 0:
+            elf["shnum"] = 0
+        if elf["phoff"] + elf["phnum"] * elf["phentsize"] > len(data) or elf["phentsize"] == 0:
+            elf["phnum"] = 0
+
+        sections = []
+        for i in range(elf["shnum"]):
+            hdr = elf["shoff"] + i * elf["shentsize"]
+            sections.append({
+                "index": i,
+                "hdr": hdr,
+                "name_off": struct.unpack_from(endian + "I", data, hdr)[0],
+                "type": struct.unpack_from(endian + "I", data, hdr + lay["sh_type"])[0],
+                "offset": struct.unpack_from(word, data, hdr + lay["sh_offset"])[0],
+                "size": struct.unpack_from(word, data, hdr + lay["sh_size"])[0],
+            })
+        if sections and elf["shstrndx"] < len(sections):
+            strtab = sections[elf["shstrndx"]]
+            table = data[strtab["offset"]:strtab["offset"] + strtab["size"]]
+            for s in sections:
+                end = table.find(b"\x00", s["name_off"])
+                s["name"] = table[s["name_off"]:end].decode("latin1") if end >= 0 else ""
+        elf["sections"] = sections
+        return elf
+    except struct.error:
+        return None
+
+
+def _elf_body_sections(elf, data):
+    """有文件内容 (非 NOBITS) 且范围合法的节"""
+    return [s for s in elf["sections"]
+            if s["type"] != SHT_NOBITS and s["size"] > 0 and s["offset"] + s["size"] <= len(data)]
+
+
+def elf_mutate_field(data, mutate_bytes):
+    """改写 ELF 头 / 节头中与布局无关的字段 (类型、标志、link/info、对齐等)，偏移字段保持不变"""
+    elf = parse_elf(data)
+    if elf is None:
+        return None
+    lay, endian = elf["layout"], elf["endian"]
+    res = bytearray(data)
+    if elf["sections"] and random.random() < 0.7:
+        base = random.choice(elf["sections"])["hdr"]
+        off, fmt = random.choice(lay["shdr_fields"])
+    else:
+        base = 0
+        off, fmt = random.choice(lay["ehdr_fields"])
+    mask = (1 << (8 * struct.calcsize(fmt))) - 1
+    struct.pack_into(endian + fmt, res, base + off, random.choice(INTERESTING_FIELD_VALUES) & mask)
+    return bytes(res)
+
+
+def elf_mutate_section_body(data, mutate_bytes):
+    """只在某个节的内容内部做字节级变异，长度不变，头部与偏移不受影响"""
+    elf = parse_elf(data)
+    if elf is None:
+        return None
+    bodies = _elf_body_sections(elf, data)
+    if not bodies:
+        return None
+    s = random.choice(bodies)
+    start, end = s["offset"], s["offset"] + s["size"]
+    body = mutate_bytes(data[start:end])[:s["size"]].ljust(s["size"], b"\x00")
+    return data[:start] + body + data[end:]
+
+
+def elf_resize_section(data, mutate_bytes):
+    """
+    在某个节内部插入/删除字节，并同步修正:
+    该节的 sh_size、插入点之后的 sh_offset / p_offset / e_shoff / e_phoff，以及包含插入点的段的 p_filesz / p_memsz。
+    """
+    elf = parse_elf(data)
+    if elf is None:
+        return None
+    bodies = _elf_body_sections(elf, data)
+    if not bodies:
+        return None
+    lay, endian = elf["layout"], elf["endian"]
+    word = endian + lay["word"]
+    word_size = struct.calcsize(word)
+    s = random.choice(bodies)
+    end = s["offset"] + s["size"]
+
+    if random.random() < 0.5 or s["size"] <= 1:
+        pos = random.randint(s["offset"], end)
+        chunk = mutate_bytes(data[s["offset"]:end])[:random.randint(1, 64)]
+        if not chunk:
+            return None
+        delta = len(chunk)
+        res = bytearray(data[:pos] + chunk + data[pos:])
+    else:
+        pos = random.randint(s["offset"], end - 1)
+        delta = -random.randint(1, min(64, end - pos))
+        # 删除范围内不能包含节头表/程序头表
+        if any(pos < table < pos - delta for table in (elf["shoff"], elf["phoff"])):
+            return None
+        res = bytearray(data[:pos] + data[pos - delta:])
+
+    def moved(value, is_self=False):
+        # 恰好从 pos 开始的内容：插入时被挤到后面 (除了被修改的节本身)，删除时不动
+        return value > pos or (value == pos and delta > 0 and not is_self)
+
+    def fix(field_pos, update):
+        if 0 <= field_pos and field_pos + word_size <= len(res):
+            value = struct.unpack_from(word, res, field_pos)[0]
+            struct.pack_into(word, res, field_pos, max(0, update(value)))
+
+    new_shoff = elf["shoff"] + delta if moved(elf["shoff"]) else elf["shoff"]
+    new_phoff = elf["phoff"] + delta if moved(elf["phoff"]) else elf["phoff"]
+    if elf["shnum"]:
+        struct.pack_into(word, res, lay["shoff"], new_shoff)
+    if elf["phnum"]:
+        struct.pack_into(word, res, lay["phoff"], new_phoff)
+
+    for i in range(elf["shnum"]):
+        hdr = new_shoff + i * elf["shentsize"]
+        is_self = i == s["index"]
+        fix(hdr + lay["sh_offset"], lambda v: v + delta if moved(v, is_self) else v)
+        if is_self:
+            fix(hdr + lay["sh_size"], lambda v: v + delta)
+
+    for i in range(elf["phnum"]):
+        hdr = new_phoff + i * elf["phentsize"]
+        if hdr + lay["p_memsz"] + word_size > len(res):
+            break
+        p_offset = struct.unpack_from(word, res, hdr + lay["p_offset"])[0]
+        p_filesz = struct.unpack_from(word, res, hdr + lay["p_filesz"])[0]
+        if p_offset <= pos < p_offset + p_filesz:
+            struct.pack_into(word, res, hdr + lay["p_filesz"], max(0, p_filesz + delta))
+            fix(hdr + lay["p_memsz"], lambda v: v + delta)
+        elif moved(p_offset):
+            struct.pack_into(word, res, hdr + lay["p_offset"], p_offset + delta)
+    return bytes(res)
+
+
+# === XML / JSON: 基于词法的子树变异 ===
+XML_TAG_RE = re.compile(rb"<(/?)([A-Za-z_][\w:.\-]*)[^<>]*?(/?)>")
+BRACKET_PAIRS = {ord("{"): ord("}"), ord("["): ord("]"), ord("("): ord(")")}
+CLOSE_BRACKETS = set(BRACKET_PAIRS.values())
+
+
+def xml_subtrees(data):
+    """返回所有配对完整的元素区间 [(start, end), ...]，包括自闭合标签"""
+    spans, stack = [], []
+    for m in XML_TAG_RE.finditer(data):
+        closing, name, self_closing = m.group(1), m.group(2), m.group(3)
+        if self_closing:
+            spans.append((m.start(), m.end()))
+        elif not closing:
+            stack.append((name, m.start()))
+        else:
+            # 向下找同名开始标签，中间未闭合的直接丢弃 (容忍残缺输入)
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i][0] == name:
+                    spans.append((stack[i][1], m.end()))
+                    del stack[i:]
+                    break
+    return spans
+
+
+def bracket_subtrees(data):
+    """JSON / JS 的 {} [] () 配对区间以及字符串字面量，跳过字符串内部的括号"""
+    spans, stack = [], []
+    i, n = 0, len(data)
+    while i < n:
+        c = data[i]
+        if c in (ord('"'), ord("'")):
+            j = i + 1
+            while j < n and data[j] != c:
+                j += 2 if data[j] == ord("\\") else 1
+            spans.append((i, min(j + 1, n)))
+            i = j + 1
+            continue
+        if c in BRACKET_PAIRS:
+            stack.append((c, i))
+        elif c in CLOSE_BRACKETS and stack and BRACKET_PAIRS[stack[-1][0]] == c:
+            spans.append((stack.pop()[1], i + 1))
+        i += 1
+    return spans
+
+
+def _tree_mutate(data, spans):
+    """交换 / 复制 / 删除 / 替换子树"""
+    if not spans:
+        return None
+    a = random.choice(spans)
+    op = random.choice(["swap", "dup", "delete", "replace"])
+    if op in ("swap", "replace") and len(spans) > 1:
+        b = random.choice(spans)
+        # 两个区间不能互相包含或重叠
+        if a[1] <= b[0] or b[1] <= a[0]:
+            if op == "replace":
+                return data[:a[0]] + data[b[0]:b[1]] + data[a[1]:]
+            first, second = sorted([a, b])
+            return (data[:first[0]] + data[second[0]:second[1]] + data[first[1]:second[0]]
+                    + data[first[0]:first[1]] + data[second[1]:])
+        op = "dup"
+    if op == "delete":
+        return data[:a[0]] + data[a[1]:]
+    # dup: 子树复制一份紧跟在原位置之后
+    return data[:a[1]] + data[a[0]:a[1]] + data[a[1]:]
+
+
+def xml_mutate_tree(data, mutate_bytes):
+    return _tree_mutate(data, xml_subtrees(data))
+
+
+def json_mutate_tree(data, mutate_bytes):
+    return _tree_mutate(data, bracket_subtrees(data))
+
+
+def tree_mutate_leaf(data, mutate_bytes, subtrees):
+    """只变异一个子树内部的内容，两侧结构保持不变"""
+    spans = subtrees(data)
+    if not spans:
+        return None
+    start, end = random.choice(spans)
+    return data[:start] + mutate_bytes(data[start:end]) + data[end:]
+
+
+def xml_mutate_leaf(data, mutate_bytes):
+    return tree_mutate_leaf(data, mutate_bytes, xml_subtrees)
+
+
+def json_mutate_leaf(data, mutate_bytes):
+    return tree_mutate_leaf(data, mutate_bytes, bracket_subtrees)
+
+
+# === PCAP ===
+PCAP_MAGICS = {
+    b"\xd4\xc3\xb2\xa1": "<", b"\xa1\xb2\xc3\xd4": ">",  # 微秒时间戳
+    b"\x4d\x3c\xb2\xa1": "<", b"\xa1\xb2\x3c\x4d": ">",  # 纳秒时间戳
+}
+PCAP_GLOBAL_HDR = 24
+PCAP_RECORD_HDR = 16
+# 常见链路层类型: NULL, EN10MB, RAW, IEEE802_11, LINUX_SLL, IEEE802_11_RADIO, LINUX_SLL2
+PCAP_LINKTYPES = [0, 1, 101, 105, 113, 127, 276]
+
+
+def parse_pcap(data):
+    """返回 (endian, [(ts_sec, ts_usec, orig_len, payload), ...])，失败返回 None"""
+    endian = PCAP_MAGICS.get(data[:4])
+    if endian is None or len(data) < PCAP_GLOBAL_HDR:
+        return None
+    records, pos = [], PCAP_GLOBAL_HDR
+    while pos + PCAP_RECORD_HDR <= len(data):
+        ts_sec, ts_usec, incl_len, orig_len = struct.unpack_from(endian + "IIII", data, pos)
+        pos += PCAP_RECORD_HDR
+        payload = data[pos:pos + incl_len]  # 末尾被截断的记录按实际长度保留
+        records.append((ts_sec, ts_usec, orig_len, payload))
+        pos += incl_len
+    return endian, records
+
+
+def build_pcap(header, endian, records):
+    """重新打包记录，caplen 取实际负载长度，len 不小于 caplen"""
+    out = bytearray(header)
+    for ts_sec, ts_usec, orig_len, payload in records:
+        out += struct.pack(endian + "IIII", ts_sec, ts_usec, len(payload), max(orig_len, len(payload)))
+        out += payload
+    return bytes(out)
+
+
+def pcap_mutate_record(data, mutate_bytes):
+    """变异某条记录的负载 (长度可变)，并修正 caplen/len"""
+    parsed = parse_pcap(data)
+    if parsed is None or not parsed[1]:
+        return None
+    endian, records = parsed
+    i = random.randrange(len(records))
+    ts_sec, ts_usec, orig_len, payload = records[i]
+    new_payload = mutate_bytes(payload) if payload else payload
+    # 有一半概率让 len 跟随新的 caplen，另一半保留原 len 制造截断包
+    records[i] = (ts_sec, ts_usec, len(new_payload) if random.random() < 0.5 else orig_len, new_payload)
+    return build_pcap(data[:PCAP_GLOBAL_HDR], endian, records)
+
+
+def pcap_mutate_records(data, mutate_bytes):
+    """记录级操作：复制 / 删除 / 交换 / 与其他记录拼接负载"""
+    parsed = parse_pcap(data)
+    if parsed is None or not parsed[1]:
+        return None
+    endian, records = parsed
+    op = random.choice(["dup", "delete", "swap", "splice"])
+    i, j = random.randrange(len(records)), random.randrange(len(records))
+    if op == "dup":
+        records.insert(j, records[i])
+    elif op == "delete" and len(records) > 1:
+        del records[i]
+    elif op == "swap":
+        records[i], records[j] = records[j], records[i]
+    else:
+        a, b = records[i][3], records[j][3]
+        cut = random.randint(0, min(len(a), len(b)))
+        payload = a[:cut] + b[cut:]
+        records[i] = (records[i][0], records[i][1], len(payload), payload)
+    return build_pcap(data[:PCAP_GLOBAL_HDR], endian, records)
+
+
+def pcap_mutate_linktype(data, mutate_bytes):
+    """改写全局头中的链路层类型，让同样的负载走不同的解码器"""
+    parsed = parse_pcap(data)
+    if parsed is None:
+        return None
+    res = bytearray(data)
+    struct.pack_into(parsed[0] + "I", res, 20, random.choice(PCAP_LINKTYPES))
+    return bytes(res)
+
+
+# === 注册表：按目标输入格式选择 ===
+FORMAT_MUTATORS = {
+    "elf": [elf_mutate_field, elf_mutate_section_body, elf_resize_section],
+    "xml": [xml_mutate_tree, xml_mutate_leaf],
+    "json": [json_mutate_tree, json_mutate_leaf],
+    "pcap": [pcap_mutate_record, pcap_mutate_records, pcap_mutate_linktype],
+}
@@ -1,21 +1,25 @@
 import os, subprocess, sysv_ipc
+import bitmap
+
+TARGET_PATH = "./target/target_instrumented"
+MAP_SIZE = bitmap.negotiate_map_size(TARGET_PATH)
 
 
 def run_and_get_raw_shm(input_bytes):
-    MAP_SIZE = 65536
     shm = sysv_ipc.SharedMemory(None, flags=sysv_ipc.IPC_CREAT | sysv_ipc.IPC_EXCL, mode=0o600, size=MAP_SIZE)
     shm.write(b'\x00' * MAP_SIZE)
 
     env = os.environ.copy()
     env["__AFL_SHM_ID"] = str(shm.id)
+    env["AFL_MAP_SIZE"] = str(MAP_SIZE)
 
-    proc = subprocess.Popen(["./target/target_instrumented"],
+    proc = subprocess.Popen([TARGET_PATH],
                             stdin=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
     _, stderr = proc.communicate(input=input_bytes)
 
     # 获取所有非零字节的索引
-    bitmap = shm.read(MAP_SIZE)
-    active_indices = [i for i, v in enumerate(bitmap) if v > 0]
+    trace = shm.read(MAP_SIZE)
+    active_indices = bitmap.touched_indices(trace)
 
     shm.detach()
     shm.remove()
@@ -9,6 +9,14 @@ echo "=== 开始 10 目标【并行】自动化 Fuzzing 任务 ==="
 # ⚠️ 注意：如果要看到每 100s 的输出，DURATION 至少要大于 100
 DURATION=100
 
+# 自动字典：从目标二进制提取字符串/比较常量，补充 (或替代) 手写字典
+# 若有 AFL++ CmpLog 插装版本，可为单个目标追加 "--cmplog <path>"
+AUTO_DICT_OPT="--auto-dict"
+
+# 资源管控：每个目标进程的内存上限 (MB)，10 个 Fuzzer 共用一台机器时防止单个病态输入吃光内存
+# 机器支持 cgroup v2 且已委派 memory 控制器时，可追加 "--cgroup" 改用 memory.max
+MEM_OPT="-m 1024"
+
 # 定义计时监控函数
 monitor_time() {
     START_TIME=$(date +%s)
@@ -58,21 +66,24 @@ do
     # target9 (mjs): -f @@ (JSON/JS)
     # target10 (tcpdump): -nr @@ (PCAP)
     
+    # 同一输入格式的目标放进同一个同步组 (-g)，定期互相导入 queue 中的种子
     ARGS=""
     DICT_OPT=""
     STDIN_OPT=""
+    SYNC_OPT=""
+    FORMAT_OPT=""  # 结构感知变异 (-f elf/xml/json/pcap)
 
     case $i in
         1) STDIN_OPT="-s"; ARGS="" ;;  # cxxfilt: Fuzzer开启stdin模式
-        2) ARGS="-a @@"; DICT_OPT="-x dicts/elf.dict" ;;
-        3) ARGS="@@"; DICT_OPT="-x dicts/elf.dict" ;;
-        4) ARGS="-d @@"; DICT_OPT="-x dicts/elf.dict" ;;
+        2) ARGS="-a @@"; DICT_OPT="-x dicts/elf.dict"; SYNC_OPT="-g elf"; FORMAT_OPT="-f elf" ;;
+        3) ARGS="@@"; DICT_OPT="-x dicts/elf.dict"; SYNC_OPT="-g elf"; FORMAT_OPT="-f elf" ;;
+        4) ARGS="-d @@"; DICT_OPT="-x dicts/elf.dict"; SYNC_OPT="-g elf"; FORMAT_OPT="-f elf" ;;
         5) ARGS="@@" ;;
         6) STDIN_OPT="-s"; ARGS="" ;;  # readpng: Fuzzer开启stdin模式
-        7) ARGS="@@"; DICT_OPT="-x dicts/xml.dict" ;;
-        8) ARGS="@@"; DICT_OPT="-x dicts/xml.dict" ;;
-        9) ARGS="-f @@"; DICT_OPT="-x dicts/json.dict" ;;
-        10) ARGS="-nr @@" ;;
+        7) ARGS="@@"; DICT_OPT="-x dicts/xml.dict"; SYNC_OPT="-g xml"; FORMAT_OPT="-f xml" ;;
+        8) ARGS="@@"; DICT_OPT="-x dicts/xml.dict"; SYNC_OPT="-g xml"; FORMAT_OPT="-f xml" ;;
+        9) ARGS="-f @@"; DICT_OPT="-x dicts/json.dict"; FORMAT_OPT="-f json" ;;
+        10) ARGS="-nr @@"; FORMAT_OPT="-f pcap" ;;
         *) ARGS="@@" ;; # 默认
     esac
 
@@ -104,7 +115,7 @@ do
 
     # 以后台模式启动 &
     # python3 -u fuzzer/main.py <target> [options] [ -- target_args ]
-    python3 -u fuzzer/main.py "$TARGET_BIN" $DICT_OPT $SEED_OPT $STDIN_OPT -t $DURATION $FINAL_ARGS > "$LOG_FILE" 2>&1 &
+    python3 -u fuzzer/main.py "$TARGET_BIN" $DICT_OPT $AUTO_DICT_OPT $SEED_OPT $STDIN_OPT $SYNC_OPT $FORMAT_OPT $MEM_OPT -t $DURATION $FINAL_ARGS > "$LOG_FILE" 2>&1 &
 
     # 记录当前 Fuzzer 的 PID
     FUZZER_PIDS="$FUZZER_PIDS $!"